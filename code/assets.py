@@ -0,0 +1,112 @@
+from settings import *
+from os import stat, makedirs, replace, remove, fdopen
+from os.path import normpath, exists, dirname
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import mkstemp
+import pickle
+
+# Every image that has been loaded, keyed by its path so that the same file is never loaded twice
+images = {}
+
+# Masks and white "hit flash" surfaces for every image that can collide, keyed by the image surface so each one is only made once
+masks = {}
+flash_surfaces = {}
+
+def load_masks(surfaces):
+    # Run this when the images are loaded, after that the sprites can look up the mask for their current image instead of pygame making a new one on every collision check
+    for surf in surfaces:
+        if surf not in masks:
+            masks[surf] = pygame.mask.from_surface(surf)
+            # The mask turned into a surface is white where the image has pixels and black everywhere else, the black is then made see through
+            flash = masks[surf].to_surface()
+            flash.set_colorkey('black')
+            flash_surfaces[surf] = flash
+
+def load_images(paths):
+    # Decoding the png files is the slow part and can happen on a pool of threads, convert_alpha needs the display so that part happens back on the main thread
+    keys = [normpath(path) for path in paths]
+    # dict.fromkeys removes any repeated paths while keeping them in order
+    new_keys = [key for key in dict.fromkeys(keys) if key not in images]
+    if new_keys:
+        with ThreadPoolExecutor() as executor:
+            for key, surf in zip(new_keys, executor.map(pygame.image.load, new_keys)):
+                images[key] = surf.convert_alpha()
+    return [images[key] for key in keys]
+
+def load_image(path):
+    return load_images([path])[0]
+
+def load_folder(path):
+    # Loads the frames of an animation, the files are named 0.png, 1.png... so they are sorted by the number before the '.'
+    file_names = sorted(next(walk(path))[2], key = lambda name: int(name.split('.')[0]))
+    return load_images([join(path, file_name) for file_name in file_names])
+
+def preload_folder(path):
+    # Loads every png in the folder and its sub folders in one go so that they are all decoded at the same time
+    load_images([join(folder_path, file_name) for folder_path, _, file_names in walk(path) for file_name in file_names if file_name.endswith('.png')])
+
+def data_mtimes(folder, cache_path):
+    # The last time every file in the folder was changed, if any of them changed (the map, the tilesets or their images) the map cache is out of date
+    # The cache folder is skipped since the cache (and the temporary files it is written to) changes every time it is saved
+    cache_folder = normpath(dirname(cache_path))
+    paths = [normpath(join(folder_path, file_name)) for folder_path, _, file_names in walk(folder) if normpath(folder_path) != cache_folder for file_name in file_names]
+    return {path: stat(path).st_mtime_ns for path in paths}
+
+def parse_map(path):
+    # Reads the TMX map with pytmx and keeps only what the game uses, the images are stored as raw RGBA bytes so the whole thing can be saved with pickle
+    # This imports a TMX map that you can use inside of the code, pytmx is only needed when the cache is out of date so it is imported here to keep it out of a normal start up
+    from pytmx.util_pygame import load_pygame
+    map = load_pygame(path)
+    surfaces = {}
+    def image_index(image):
+        # The same tile image is used all over the map, so each image is only stored once
+        if image not in surfaces:
+            surfaces[image] = len(surfaces)
+        return surfaces[image]
+
+    layers = {
+        'Ground': [(x, y, image_index(image)) for x, y, image in map.get_layer_by_name('Ground').tiles()],
+        'Collisions': [(obj.x, obj.y, obj.width, obj.height) for obj in map.get_layer_by_name('Collisions')],
+        'Objects': [(obj.x, obj.y, image_index(obj.image)) for obj in map.get_layer_by_name('Objects')],
+        'Entities': [(obj.name, obj.x, obj.y) for obj in map.get_layer_by_name('Entities')],
+    }
+    layers['images'] = [(surf.get_size(), pygame.image.tobytes(surf, 'RGBA')) for surf in surfaces]
+    return layers
+
+def save_cache(cache_path, cache):
+    # The cache is written to a temporary file next to it and then swapped into place in one go, so a game starting at the same time (like the playback processes) never reads a half written cache
+    makedirs(dirname(cache_path), exist_ok = True)
+    handle, temporary_path = mkstemp(dir = dirname(cache_path), suffix = '.tmp')
+    try:
+        with fdopen(handle, 'wb') as file:
+            pickle.dump(cache, file, pickle.HIGHEST_PROTOCOL)
+        replace(temporary_path, cache_path)
+    except BaseException:
+        remove(temporary_path)
+        raise
+
+def load_map(path, cache_path):
+    # Gives back the map layers, from the cache if none of the files in the data folder have changed since it was saved, otherwise from the TMX file
+    mtimes = data_mtimes(dirname(dirname(path)), cache_path)
+    layers = None
+    if exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as file:
+                cache = pickle.load(file)
+            if cache['mtimes'] == mtimes:
+                layers = cache['layers']
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, ValueError, TypeError):
+            # A broken or old cache is just rebuilt
+            layers = None
+    if layers is None:
+        layers = parse_map(path)
+        save_cache(cache_path, {'mtimes': mtimes, 'layers': layers})
+
+    # Turns the stored bytes back into surfaces and swaps the image indexes for the surfaces
+    surfaces = [pygame.image.frombytes(data, size, 'RGBA').convert_alpha() for size, data in layers['images']]
+    return {
+        'Ground': [(x, y, surfaces[index]) for x, y, index in layers['Ground']],
+        'Collisions': layers['Collisions'],
+        'Objects': [(x, y, surfaces[index]) for x, y, index in layers['Objects']],
+        'Entities': layers['Entities'],
+    }
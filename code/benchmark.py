@@ -0,0 +1,78 @@
+# Runs the game headless with a fixed delta time and times each part of the frame at growing enemy counts
+# Run from the project folder with: python code/benchmark.py [--frames 300] [--enemies 0 250 1000 2500] [--json results.json]
+import sys
+from os.path import dirname
+# Lets the game's modules import each other the same way they do when main.py is run
+sys.path.insert(0, dirname(__file__))
+
+import argparse, json
+from settings import *
+from math import cos, sin
+from statistics import quantiles
+from time import perf_counter
+from main import Game
+from controls import ScriptedControls
+
+def aim_and_shoot(frame, controls):
+    # Holds the left mouse button down and sweeps the aim in a circle around the player, walking in a square so that the camera moves
+    controls.mouse_buttons = (True, False, False)
+    controls.mouse_pos = (WINDOW_WIDTH / 2 + 300 * cos(frame / 20), WINDOW_HEIGHT / 2 + 300 * sin(frame / 20))
+    controls.pressed_keys = {(pygame.K_d, pygame.K_s, pygame.K_a, pygame.K_w)[(frame // 60) % 4]}
+
+def percentiles(times):
+    # Gives back the 50th, 95th and 99th percentile in miliseconds
+    if len(times) < 2:
+        times = times * 2
+    cuts = quantiles(times, n = 100, method = 'inclusive')
+    return {'p50': cuts[49] * 1000, 'p95': cuts[94] * 1000, 'p99': cuts[98] * 1000}
+
+def run_level(enemy_count, frames, seed, dt):
+    game = Game(headless = True, seed = seed, fixed_dt = dt, controls = ScriptedControls(aim_and_shoot))
+    # The enemies are added up front so the level is measured at (roughly) that many enemies, the normal enemy timer keeps adding more as it runs
+    for _ in range(enemy_count):
+        game.spawn_enemy()
+
+    phases = {
+        'update': lambda: game.update(dt),
+        'bullet_collision': game.bullet_collision,
+        'player_collision': game.player_collision,
+        'draw': game.draw,
+    }
+    times = {name: [] for name in phases}
+    for _ in range(frames):
+        game.clock.tick()
+        game.events()
+        for name, phase in phases.items():
+            start = perf_counter()
+            phase()
+            times[name].append(perf_counter() - start)
+        pygame.display.update()
+        # The benchmark keeps going even when the player gets caught
+        game.running = True
+
+    result = {name: percentiles(phase_times) for name, phase_times in times.items()}
+    result['frame'] = percentiles([sum(frame_times) for frame_times in zip(*times.values())])
+    result['enemies_at_end'] = len(game.enemy_sprites)
+    pygame.quit()
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Headless frame time benchmark for Gun Survivor')
+    parser.add_argument('--frames', type = int, default = 300)
+    parser.add_argument('--enemies', type = int, nargs = '+', default = [0, 250, 1000, 2500])
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--dt', type = float, default = 1 / 60)
+    parser.add_argument('--json', help = 'also write the results to this file')
+    args = parser.parse_args()
+
+    results = {'frames': args.frames, 'seed': args.seed, 'dt': args.dt, 'levels': {}}
+    for enemy_count in args.enemies:
+        level = run_level(enemy_count, args.frames, args.seed, args.dt)
+        results['levels'][str(enemy_count)] = level
+        print(f'{enemy_count} enemies (ended with {level["enemies_at_end"]})')
+        for name in ('update', 'bullet_collision', 'player_collision', 'draw', 'frame'):
+            print(f'    {name:<17} p50 {level[name]["p50"]:7.3f} ms   p95 {level[name]["p95"]:7.3f} ms   p99 {level[name]["p99"]:7.3f} ms')
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent = 4)
@@ -0,0 +1,58 @@
+# Compares the draw order of AllSprites against sorting every visible sprite from scratch each frame
+# Run from the code folder with: python benchmark_y_sort.py
+import os
+# Lets pygame run without opening a window
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from settings import *
+from groups import AllSprites
+from random import Random
+from time import perf_counter
+
+MAP_WIDTH, MAP_HEIGHT = 52 * TILE_SIZE, 50 * TILE_SIZE
+FRAMES = 200
+
+class Mover(pygame.sprite.Sprite):
+    def __init__(self, pos, groups):
+        super().__init__(groups)
+        self.rect = pygame.FRect(0, 0, 60, 100)
+        self.rect.center = pos
+
+class StaticObject(pygame.sprite.Sprite):
+    static = True
+
+    def __init__(self, pos, groups):
+        super().__init__(groups)
+        self.rect = pygame.FRect(pos, (128, 128))
+
+def sort_from_scratch(group, camera_rect):
+    # The way AllSprites used to order the sprites, every visible sprite sorted with no memory of the last frame
+    object_sprites = [sprite for sprite in group if sprite.rect.colliderect(camera_rect)]
+    return sorted(object_sprites, key=lambda sprite: sprite.rect.centery)
+
+def run(enemy_count, order):
+    random = Random(enemy_count)
+    group = AllSprites()
+    for _ in range(160):
+        StaticObject((random.uniform(0, MAP_WIDTH), random.uniform(0, MAP_HEIGHT)), group)
+    movers = [Mover((random.uniform(0, MAP_WIDTH), random.uniform(0, MAP_HEIGHT)), group) for _ in range(enemy_count)]
+    camera_rect = pygame.FRect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+    camera_rect.center = (MAP_WIDTH / 2, MAP_HEIGHT / 2)
+
+    total = 0
+    for _ in range(FRAMES):
+        # Every sprite moves a few pixels like the enemies do in the game
+        for mover in movers:
+            mover.rect.y += random.uniform(-3, 3)
+        start = perf_counter()
+        order(group, camera_rect)
+        total += perf_counter() - start
+    return total / FRAMES * 1000
+
+if __name__ == '__main__':
+    pygame.init()
+    print(f'{"enemies":>8} {"from scratch (ms)":>18} {"AllSprites (ms)":>17} {"speedup":>8}')
+    for enemy_count in (100, 1000, 5000):
+        old = run(enemy_count, sort_from_scratch)
+        new = run(enemy_count, AllSprites.y_sorted)
+        print(f'{enemy_count:>8} {old:>18.3f} {new:>17.3f} {old / new:>7.2f}x')
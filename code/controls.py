@@ -0,0 +1,60 @@
+from settings import *
+from collections import defaultdict
+
+class Clock:
+    # The normal clock, the time comes from pygame
+    def __init__(self):
+        self.clock = pygame.time.Clock()
+
+    def tick(self, framerate = 0):
+        # Gives back the time since the last tick in milliseconds, with a framerate it waits so that there are never more frames than that each second
+        return self.clock.tick(framerate)
+
+class FixedClock:
+    # A clock for the headless mode, every tick moves the time forward by the same amount so that every run plays out exactly the same
+    # It never waits, so the headless mode runs as fast as it can
+    def __init__(self, dt):
+        self.dt = dt
+
+    def tick(self, framerate = 0):
+        return self.dt * 1000
+
+class Controls:
+    # Reads the keyboard and the mouse from pygame
+    def next_frame(self):
+        # Called at the start of every frame, the real keyboard and mouse don't need to do anything here
+        pass
+
+    def get_pressed(self):
+        return pygame.key.get_pressed()
+
+    def get_pos(self):
+        return pygame.mouse.get_pos()
+
+    def get_mouse_pressed(self):
+        return pygame.mouse.get_pressed()
+
+class ScriptedControls(Controls):
+    # Used by the headless mode instead of a real keyboard and mouse, the script decides what is being pressed on every frame
+    def __init__(self, script = None):
+        # The script is called with the frame number and these controls at the start of every frame and can change the values below
+        self.script = script
+        self.frame = 0
+        self.pressed_keys = set()
+        self.mouse_pos = (WINDOW_WIDTH / 2, WINDOW_HEIGHT)
+        self.mouse_buttons = (False, False, False)
+
+    def next_frame(self):
+        if self.script:
+            self.script(self.frame, self)
+        self.frame += 1
+
+    def get_pressed(self):
+        # Works like pygame.key.get_pressed, keys[pygame.K_d] is True if the key is pressed
+        return defaultdict(bool, {key: True for key in self.pressed_keys})
+
+    def get_pos(self):
+        return self.mouse_pos
+
+    def get_mouse_pressed(self):
+        return self.mouse_buttons
@@ -0,0 +1,52 @@
+from settings import *
+
+class SpawnDirector:
+    def __init__(self, spawn_positions, enemy_type_count, random):
+        # Decides when and where enemies spawn and removes the ones that have been left far behind, the game does the actual spawning
+        self.spawn_positions = spawn_positions
+        self.enemy_type_count = enemy_type_count
+        # The game's seeded random, so the spawns are the same every run when a seed is given
+        self.random = random
+
+        # spawn_time is the game time of the last spawn, despawn_time the last time the far away enemies were checked
+        self.spawn_time = 0
+        self.despawn_time = 0
+
+    def spawn_interval(self, game_time):
+        # The time between spawns at this point in the game, worked out from SPAWN_RATE_CURVE by sliding between the two points on either side
+        for (start_time, start_interval), (end_time, end_interval) in zip(SPAWN_RATE_CURVE, SPAWN_RATE_CURVE[1:]):
+            if game_time < end_time:
+                progress = max(game_time - start_time, 0) / (end_time - start_time)
+                return start_interval + (end_interval - start_interval) * progress
+        return SPAWN_RATE_CURVE[-1][1]
+
+    def update(self, game_time, player_pos, live_enemies):
+        # Gives back a (spawn position, enemy type) for every enemy that should spawn now, if a frame took longer than the interval more than one spawns to catch up
+        # While the budget is full the spawns are skipped instead of saved up, so a wave doesn't pour in the moment a few enemies are shot
+        while game_time - self.spawn_time >= self.spawn_interval(self.spawn_time):
+            self.spawn_time += self.spawn_interval(self.spawn_time)
+            if live_enemies < ENEMY_BUDGET:
+                live_enemies += 1
+                yield self.choose(player_pos)
+
+    def choose(self, player_pos):
+        # Enemies spawn out of sight if they can, so they walk onto the screen instead of popping up next to the player
+        # The view is made a bit bigger than the window so that the whole enemy is out of sight and not just its center
+        view = pygame.FRect((0, 0), (WINDOW_WIDTH, WINDOW_HEIGHT)).inflate(TILE_SIZE * 2, TILE_SIZE * 2)
+        view.center = player_pos
+        player_pos = pygame.Vector2(player_pos)
+        hidden = [pos for pos in self.spawn_positions if not view.collidepoint(pos)]
+        # Spawning further away than the despawn distance would have the enemy removed again straight away
+        in_range = [pos for pos in hidden if player_pos.distance_squared_to(pos) <= ENEMY_DESPAWN_DISTANCE ** 2]
+        positions = in_range or hidden or self.spawn_positions
+        return self.random.choice(positions), self.random.randrange(self.enemy_type_count)
+
+    def despawn(self, enemies, game_time, player_pos):
+        # Every DESPAWN_CHECK_INTERVAL the enemies that are too far from the player are given back to the enemy pool, so the enemies near the player can use up the budget
+        if game_time - self.despawn_time < DESPAWN_CHECK_INTERVAL:
+            return
+        self.despawn_time = game_time
+        player_pos = pygame.Vector2(player_pos)
+        for enemy in enemies.sprites():
+            if not enemy.dying and player_pos.distance_squared_to(enemy.rect.center) > ENEMY_DESPAWN_DISTANCE ** 2:
+                enemy.kill()
@@ -0,0 +1,130 @@
+from settings import *
+from heapq import heappush, heappop
+from threading import Thread, Lock
+import numpy as np
+
+# The 8 neighbours of a cell as (column step, row step, cost), going diagonally costs the length of the diagonal
+NEIGHBOURS = [(1, 0, 1), (-1, 0, 1), (0, 1, 1), (0, -1, 1), (1, 1, 2 ** 0.5), (1, -1, 2 ** 0.5), (-1, 1, 2 ** 0.5), (-1, -1, 2 ** 0.5)]
+# The direction of each neighbour as a vector of length 1
+NEIGHBOUR_DIRECTIONS = np.array([(column_step, row_step) for column_step, row_step, _ in NEIGHBOURS]) / np.array([cost for _, _, cost in NEIGHBOURS])[:, None]
+
+class FlowField:
+    def __init__(self, collision_sprites, map_size, threaded = True):
+        # map_size is the (columns, rows) of the map in tiles, every tile is one cell of the flow field
+        self.columns, self.rows = map_size
+        # With threaded the field is worked out on a background thread so it can overlap with the rest of the frame instead of adding to one step
+        # It still holds python's GIL while it runs, which is fine because a build only takes a couple of miliseconds. The headless mode turns it off so every run is the same
+        self.threaded = threaded
+        self.blocked = self.rasterize(collision_sprites)
+        self.find_neighbours()
+
+        # The direction to move in from every cell to get closer to the player, (0, 0) when there is no way to the player
+        self.directions = np.zeros((self.columns, self.rows, 2))
+        # The cell the current directions lead to, and the cell the player is in right now
+        self.target_cell = None
+        self.player_cell = None
+        self.lock = Lock()
+        self.working = False
+
+    def rasterize(self, collision_sprites):
+        # A cell is blocked when the middle of it is inside of a collision sprite, the enemies still collide with the exact rectangles so this only has to be roughly right
+        blocked = np.zeros((self.columns, self.rows), dtype = bool)
+        for sprite in collision_sprites:
+            first_column, last_column = max(int(sprite.rect.left // TILE_SIZE), 0), min(int(sprite.rect.right // TILE_SIZE), self.columns - 1)
+            first_row, last_row = max(int(sprite.rect.top // TILE_SIZE), 0), min(int(sprite.rect.bottom // TILE_SIZE), self.rows - 1)
+            for column in range(first_column, last_column + 1):
+                for row in range(first_row, last_row + 1):
+                    if sprite.rect.collidepoint((column + 0.5) * TILE_SIZE, (row + 0.5) * TILE_SIZE):
+                        blocked[column, row] = True
+        return blocked
+
+    def find_neighbours(self):
+        # The blocked cells never change, so the neighbours of every cell are worked out once here instead of on every build
+        # The cells are numbered column * rows + row, the same order numpy stores the (columns, rows) arrays in
+        cell_count = self.columns * self.rows
+        blocked = self.blocked.tolist()
+        # Every cell's 8 neighbours as cell numbers, neighbours that are off the map or past a blocked corner are cell_count (an extra cell that is always infinitely far away)
+        self.neighbour_table = [[cell_count] * len(NEIGHBOURS) for _ in range(cell_count)]
+        for column in range(self.columns):
+            for row in range(self.rows):
+                for index, (column_step, row_step, _) in enumerate(NEIGHBOURS):
+                    next_column, next_row = column + column_step, row + row_step
+                    if not (0 <= next_column < self.columns and 0 <= next_row < self.rows):
+                        continue
+                    # Going diagonally past the corner of a blocked cell isn't allowed, the enemies would get stuck on the corner
+                    if column_step and row_step and (blocked[next_column][row] or blocked[column][next_row]):
+                        continue
+                    self.neighbour_table[column * self.rows + row][index] = next_column * self.rows + next_row
+        # The open neighbours of every cell with the cost to step there, this is what the search walks through
+        self.open_neighbours = [[(neighbour, NEIGHBOURS[index][2]) for index, neighbour in enumerate(neighbours) if neighbour < cell_count and not blocked[neighbour // self.rows][neighbour % self.rows]] for neighbours in self.neighbour_table]
+        self.neighbour_table = np.array(self.neighbour_table)
+
+    def cell(self, pos):
+        # The cell that the position is in, positions outside of the map use the closest cell on the edge
+        return (min(max(int(pos[0] // TILE_SIZE), 0), self.columns - 1), min(max(int(pos[1] // TILE_SIZE), 0), self.rows - 1))
+
+    def update(self, player_pos):
+        # The field only has to be worked out again when the player moves into a different cell
+        self.player_cell = self.cell(player_pos)
+        if self.player_cell == self.target_cell or self.working:
+            return
+        self.target_cell = self.player_cell
+        if self.threaded:
+            # Only one thread runs at a time, if the player moved on while it was working the next update starts a new one for the player's new cell
+            self.working = True
+            Thread(target = self.build, args = (self.target_cell,), daemon = True).start()
+        else:
+            self.build(self.target_cell)
+
+    def build(self, target_cell):
+        try:
+            directions = self.point_downhill(self.distances(target_cell))
+            # Swapping in the finished array in one go means the enemies never read a half finished field
+            with self.lock:
+                self.directions = directions
+        finally:
+            # Even if the build fails the next update has to be able to start a new one
+            self.working = False
+
+    def distances(self, target_cell):
+        # Dijkstra's algorithm outwards from the player's cell: how far every open cell is from the player when walking around the blocked cells
+        # This runs on plain python lists, reading single values out of numpy arrays is a lot slower than out of a list
+        distances = [float('inf')] * (self.columns * self.rows)
+        start = target_cell[0] * self.rows + target_cell[1]
+        distances[start] = 0
+        queue = [(0, start)]
+        open_neighbours = self.open_neighbours
+        while queue:
+            distance, cell = heappop(queue)
+            if distance > distances[cell]:
+                continue
+            for neighbour, cost in open_neighbours[cell]:
+                next_distance = distance + cost
+                if next_distance < distances[neighbour]:
+                    distances[neighbour] = next_distance
+                    heappush(queue, (next_distance, neighbour))
+        return distances
+
+    def point_downhill(self, distances):
+        # Every cell points towards the neighbour that is closest to the player, this is done for all of the cells at once with numpy
+        # The extra inf on the end is the distance of the made up cell that stands in for the missing neighbours
+        distances = np.array(distances + [float('inf')])
+        neighbour_distances = distances[self.neighbour_table]
+        # argmin gives back the first of the closest neighbours, in the order of NEIGHBOURS
+        closest = neighbour_distances.argmin(axis = 1)
+        # Only cells that are further away than their closest neighbour point anywhere (the player's cell and cells with no way to the player stay at 0)
+        downhill = neighbour_distances[np.arange(len(closest)), closest] < distances[:-1]
+        directions = np.where(downhill[:, None], NEIGHBOUR_DIRECTIONS[closest], 0)
+        return directions.reshape(self.columns, self.rows, 2)
+
+    def sample(self, positions):
+        # Gives back the flow direction for an array of positions (one per row), all at once for the swarm
+        columns = np.clip((positions[:, 0] // TILE_SIZE).astype(int), 0, self.columns - 1)
+        rows = np.clip((positions[:, 1] // TILE_SIZE).astype(int), 0, self.rows - 1)
+        with self.lock:
+            return self.directions[columns, rows]
+
+    def direction(self, pos):
+        # The flow direction for one position as a Vector2, used by enemies that move themselves
+        with self.lock:
+            return pygame.Vector2(*self.directions[self.cell(pos)])
@@ -1,4 +1,28 @@
 from settings import *
+from heapq import heappush, heappop
+from operator import attrgetter
+
+# Used to sort the sprites by the center y of their rectangle, attrgetter does the same as a lambda but is faster since it is built into python
+y_sort_key = attrgetter('rect.centery')
+topleft_key = attrgetter('topleft')
+
+def swap_remove(sprites, rects, indexes, sprite):
+    # Removes the sprite by moving the last sprite (and its rect) into its place, so nothing after it has to shift down one
+    # indexes holds the position of every sprite in the list so it doesn't have to be searched for
+    index = indexes.pop(sprite)
+    last_sprite = sprites.pop()
+    full = len(rects) == len(sprites) + 1
+    if last_sprite is not sprite:
+        sprites[index] = last_sprite
+        indexes[last_sprite] = index
+    # Sprites that were added since the rects were last filled in don't have their rect in the list yet
+    if full:
+        last_rect = rects.pop()
+        if index < len(rects):
+            rects[index] = last_rect
+    elif index < len(rects):
+        # The last sprite has no rect in the list to move over, so the rects from here on are filled in again next time
+        del rects[index:]
 
 class AllSprites(pygame.sprite.Group):
     def __init__(self):
@@ -6,18 +30,182 @@ class AllSprites(pygame.sprite.Group):
         # Creates an AllSprites class to inherit the pygame.display.get_surface() function
         self.display_surface = pygame.display.get_surface()
         self.offset = pygame.Vector2()
+        self.ground_chunks = []
+
+        # The sprites are split into the ones that never move (collision objects) and the ones that do
+        # The static sprites are sorted by their center y once and then stay in order
+        self.static_sprites = []
+        self.static_rects = []
+        self.static_sorted = True
+        # The rects lists line up with the sprites lists so that pygame can check all of them against the camera at once with collidelistall
+        # This works because the sprites move their rect (rect.center = ...) instead of making a new one
+        self.dynamic_sprites = []
+        self.dynamic_rects = []
+        self.dynamic_indexes = {}
+        # Where each moving sprite was before the last simulation step, used to draw them part way between two steps
+        self.previous_positions = {}
+        # How many surfaces the last draw blitted, read by the profiler
+        self.blit_count = 0
+
+    def add_internal(self, sprite, layer = None):
+        # This is called by pygame every time a sprite joins the group, the rectangle isn't set up yet so the rects are added later in y_sorted
+        super().add_internal(sprite, layer)
+        if hasattr(sprite, 'static'):
+            self.static_sprites.append(sprite)
+            self.static_sorted = False
+        else:
+            self.dynamic_indexes[sprite] = len(self.dynamic_sprites)
+            self.dynamic_sprites.append(sprite)
+            # A sprite coming back from a pool shouldn't slide over from where it was last time
+            self.previous_positions.pop(sprite, None)
+
+    def remove_internal(self, sprite):
+        # This is called by pygame every time a sprite leaves the group (for example with kill)
+        super().remove_internal(sprite)
+        if hasattr(sprite, 'static'):
+            self.static_sprites.remove(sprite)
+            self.static_sorted = False
+        else:
+            # The moving sprites are sorted every draw anyway, so their order in the list doesn't matter
+            swap_remove(self.dynamic_sprites, self.dynamic_rects, self.dynamic_indexes, sprite)
+
+    def build_ground(self, tiles):
+        # The ground never changes, so instead of a sprite for every tile the tiles are drawn once onto bigger surfaces of CHUNK_SIZE x CHUNK_SIZE tiles
+        chunk_tiles = {}
+        for x, y, image in tiles:
+            # Each tile goes onto the chunk that holds its column and row, the position inside of the chunk is the remainder
+            chunk_tiles.setdefault((x // CHUNK_SIZE, y // CHUNK_SIZE), []).append((x % CHUNK_SIZE, y % CHUNK_SIZE, image))
+
+        self.ground_chunks = []
+        for (column, row), chunk in chunk_tiles.items():
+            # The chunks on the edge of the map are cut down to the tiles that are actually in them
+            width = (max(x for x, _, _ in chunk) + 1) * TILE_SIZE
+            height = (max(y for _, y, _ in chunk) + 1) * TILE_SIZE
+            # The chunks start out black like the screen, so they don't need their own alpha channel and are quicker to make and draw
+            surf = pygame.Surface((width, height))
+            surf.blits([(image, (x * TILE_SIZE, y * TILE_SIZE)) for x, y, image in chunk], False)
+            # Stores every chunk with the rectangle it covers on the map so that it can be checked against the camera
+            self.ground_chunks.append((surf, surf.get_frect(topleft = (column * CHUNK_SIZE * TILE_SIZE, row * CHUNK_SIZE * TILE_SIZE))))
 
-    def draw(self, target_pos):
+    def save_positions(self):
+        # Called before every simulation step, map and attrgetter do the whole list inside of python's C code which keeps this quick with lots of sprites
+        self.dynamic_rects.extend(sprite.rect for sprite in self.dynamic_sprites[len(self.dynamic_rects):])
+        self.previous_positions = dict(zip(self.dynamic_sprites, map(topleft_key, self.dynamic_rects)))
+
+    def position(self, sprite, alpha):
+        # Gives back where to draw the sprite: alpha is how far the game is between the last simulation step (0) and the next one (1)
+        previous = self.previous_positions.get(sprite)
+        if previous is None or alpha >= 1:
+            return pygame.Vector2(sprite.rect.topleft)
+        return pygame.Vector2(previous).lerp(sprite.rect.topleft, alpha)
+
+    def draw(self, target_pos, alpha = 1):
         # Sets up the camera to put the player in the middle of the screen and follow the player if they move left, right, up or down. [0] references the x position and [1] references the y position
         self.offset.x = -(target_pos[0] - WINDOW_WIDTH / 2)
         self.offset.y = -(target_pos[1] - WINDOW_HEIGHT / 2)
-        
-        ground_sprites = [sprite for sprite in self if hasattr(sprite, 'ground')]
-        object_sprites = [sprite for sprite in self if not hasattr(sprite, 'ground')]
-
-        for layer in [ground_sprites, object_sprites]:
-        # A dynamic comparison of the center y of the player vs the object sprites, whichever is greater will be drawn later
-        # Lambda is taking all of the information from the self group, then passing it through the arguement of sprite and sorting the values of the center y. Sorted works from lowest to highest
-            for sprite in sorted(layer, key=lambda sprite: sprite.rect.centery):
-                # Creates a basic camera, it places the topleft of the player rectangle and uses the offset that was created before the loop
-                self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
\ No newline at end of file
+        # The part of the map that the camera can see, anything outside of it doesn't need to be drawn
+        camera_rect = pygame.FRect(-self.offset.x, -self.offset.y, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+        # The ground is always drawn first, only the chunks that are on the screen get drawn
+        visible_chunks = [(surf, rect) for surf, rect in self.ground_chunks if rect.colliderect(camera_rect)]
+        for surf, rect in visible_chunks:
+            self.display_surface.blit(surf, rect.topleft + self.offset)
+
+        visible_sprites = self.y_sorted(camera_rect)
+        for sprite in visible_sprites:
+            # Creates a basic camera, it places the topleft of the player rectangle and uses the offset that was created before the loop
+            self.display_surface.blit(sprite.image, self.position(sprite, alpha) + self.offset)
+        self.blit_count = len(visible_chunks) + len(visible_sprites)
+
+    def y_sorted(self, camera_rect):
+        # Gives back the sprites inside of the camera in the order they should be drawn, whichever center y is greater will be drawn later
+        # The static sprites only have to be sorted again when one is added or removed
+        if not self.static_sorted:
+            self.static_sprites.sort(key = y_sort_key)
+            self.static_rects = [sprite.rect for sprite in self.static_sprites]
+            self.static_sorted = True
+        # New sprites are always at the end of the list, so only their rects are missing
+        self.dynamic_rects.extend(sprite.rect for sprite in self.dynamic_sprites[len(self.dynamic_rects):])
+
+        # collidelistall checks every rect against the camera inside of pygame, which is a lot faster than a python loop, and gives back the indexes that are on screen
+        # The visible static sprites come out already sorted, so only the moving sprites on the screen have to be sorted
+        visible_sprites = [self.dynamic_sprites[index] for index in camera_rect.collidelistall(self.dynamic_rects)]
+        visible_sprites.sort(key = y_sort_key)
+        # Joining both sorted lists gives two sorted runs, python's sort notices this and merges them in one pass
+        visible_sprites += [self.static_sprites[index] for index in camera_rect.collidelistall(self.static_rects)]
+        visible_sprites.sort(key = y_sort_key)
+        return visible_sprites
+
+class CollisionSprites(pygame.sprite.Group):
+    def __init__(self):
+        super().__init__()
+        # Each key is a (column, row) cell of TILE_SIZE and each value is a list of the indexes of the sprites that overlap that cell
+        self.grid = {}
+        self.ordered_sprites = []
+
+    def cells(self, rect):
+        # Returns every (column, row) cell that the rectangle overlaps, floor division keeps negative positions in the correct cell
+        for column in range(int(rect.left // TILE_SIZE), int(rect.right // TILE_SIZE) + 1):
+            for row in range(int(rect.top // TILE_SIZE), int(rect.bottom // TILE_SIZE) + 1):
+                yield column, row
+
+    def build_grid(self):
+        # The collision objects never move, so the grid only has to be built once after the map has been loaded
+        self.grid = {}
+        # The group keeps the sprites in the order they were added, the index is used to check them in that same order later
+        self.ordered_sprites = self.sprites()
+        for index, sprite in enumerate(self.ordered_sprites):
+            for cell in self.cells(sprite.rect):
+                self.grid.setdefault(cell, []).append(index)
+
+    def add_nearby(self, rect, queue, seen, after):
+        # Adds the sprites in the cells around the rectangle to the queue, only if they come after the sprite that is currently being checked
+        for cell in self.cells(rect):
+            for index in self.grid.get(cell, ()):
+                if index > after and index not in seen:
+                    seen.add(index)
+                    heappush(queue, index)
+
+    def colliding(self, rect):
+        # Gives back the sprites that collide with the rectangle in the same order as looping over the whole group would
+        # The rectangle can be moved while looping (the collision code pushes it out of the sprite), when that happens the cells around the new position are checked as well
+        queue, seen = [], set()
+        self.add_nearby(rect, queue, seen, -1)
+        last_position = tuple(rect)
+        while queue:
+            index = heappop(queue)
+            sprite = self.ordered_sprites[index]
+            if sprite.rect.colliderect(rect):
+                yield sprite
+                if tuple(rect) != last_position:
+                    last_position = tuple(rect)
+                    self.add_nearby(rect, queue, seen, index)
+
+class BroadPhaseGroup(pygame.sprite.Group):
+    def __init__(self):
+        super().__init__()
+        # The rects list lines up with the sprites list so that pygame can check a rectangle against all of them at once with collidelistall
+        # This works because the sprites move their rect (rect.center = ...) instead of making a new one
+        self.sprite_list = []
+        self.rects = []
+        self.indexes = {}
+
+    def add_internal(self, sprite, layer = None):
+        # The rectangle isn't set up yet when the sprite joins the group, so the rects are added later in collide
+        super().add_internal(sprite, layer)
+        self.indexes[sprite] = len(self.sprite_list)
+        self.sprite_list.append(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        swap_remove(self.sprite_list, self.rects, self.indexes, sprite)
+
+    def collide(self, sprite, collided = None):
+        # Works like pygame.sprite.spritecollide (without dokill), but only the sprites whose rect overlaps get the more expensive collided check (like collide_mask)
+        # New sprites are always at the end of the list, so only their rects are missing
+        self.rects.extend(member.rect for member in self.sprite_list[len(self.rects):])
+        # collidelistall checks the rect against every rect inside of pygame and gives back the indexes in the order of the list
+        nearby_sprites = [self.sprite_list[index] for index in sprite.rect.collidelistall(self.rects)]
+        if collided is None:
+            return nearby_sprites
+        return [member for member in nearby_sprites if collided(sprite, member)]
@@ -1,108 +1,169 @@
 # Example file showing a basic pygame "game loop"
+import os
 import pygame
 from settings import *
 from player import Player
 from sprites import *
-from groups import AllSprites
-# This imports a TMX map that you can use inside of the code
-from pytmx.util_pygame import load_pygame
+from groups import AllSprites, CollisionSprites, BroadPhaseGroup
+from swarm import EnemySwarm
+from assets import load_masks, load_image, load_folder, preload_folder, load_map
+from pool import SpritePool
+from controls import Clock, FixedClock, Controls
+from flowfield import FlowField
+from director import SpawnDirector
+from profiler import Profiler
+from sounds import SoundManager
+from replay import ReplayRecorder
 
-from random import randint, choice
+from random import Random
 
 class Game():
-    def __init__(self):
+    def __init__(self, headless = False, seed = None, fixed_dt = None, controls = None, record = None):
+        # Headless mode runs the game without a window or sound, used by the benchmarks (benchmark.py)
+        # seed makes the enemy spawns the same every run, fixed_dt makes every frame last exactly that many seconds and controls can replace the keyboard and mouse with ScriptedControls
+        self.headless = headless
+        if self.headless:
+            # SDL's dummy drivers let pygame run without a screen or a sound card, they have to be set before pygame.init
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
         # Main setup
         pygame.init()
-        self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.display_surface = self.create_display()
         pygame.display.set_caption('Gun Survivor')
-        self.clock = pygame.time.Clock()
+        self.clock = FixedClock(fixed_dt) if fixed_dt else Clock()
+        self.controls = controls if controls else Controls()
+        self.random = Random(seed)
         self.running = True
+        # record is the path of a replay file that every simulation step gets written to (played back by playback.py)
+        self.recorder = ReplayRecorder(record) if record else None
+
+        # Fixed timestep: the game logic always moves forward by step seconds, the accumulator holds the frame time that hasn't been simulated yet
+        # game_time is how many miliseconds have been simulated, the timers use it instead of the real time
+        self.step = 1 / SIMULATION_RATE
+        self.accumulator = 0
+        self.game_time = 0
 
         # Groups
         self.all_sprites = AllSprites()
-        self.collision_sprites = pygame.sprite.Group()
+        self.collision_sprites = CollisionSprites()
         self.bullet_sprites = pygame.sprite.Group()
-        self.enemy_sprites = pygame.sprite.Group()
+        # The enemy group only runs the pixel perfect mask check on the enemies whose rect overlaps a bullet or the player
+        self.enemy_sprites = BroadPhaseGroup()
+
+        # Pools that reuse killed bullets and enemies instead of making new ones
+        self.bullet_pool = SpritePool(Bullet, BULLET_POOL_SIZE)
+        self.enemy_pool = SpritePool(Enemy, ENEMY_POOL_SIZE)
 
         # Gun timer
         self.can_shoot = True
         self.shoot_time = 0
         self.gun_cooldown = 100
 
-        # Enemy timers
-        self.enemy_event = pygame.event.custom_type()
-        pygame.time.set_timer(self.enemy_event, 100)
+        # Enemy spawns, the spawn director decides when and where (it is set up once the map has been loaded)
         self.spawn_positions = []
 
-        # Sound effects/background music
-        self.hit_sound = pygame.mixer.Sound(join('audio', 'impact.ogg'))
-        self.shoot_sound = pygame.mixer.Sound(join('audio', 'shoot.wav'))
-        bg_music = pygame.mixer.Sound(join('audio', 'music.wav'))
-        bg_music.set_volume(0.04)
-        # Setting the music to a loop of -1 will have it loop indefinitely
-        bg_music.play(loops = -1)
+        # Sound effects/background music, the headless mode skips the music
+        self.sounds = SoundManager(music = not self.headless)
 
         # Game setup 
         self.load_images()
         self.setup()
 
+        # The profiler needs the finished game to know what to time
+        self.profiler = Profiler(self)
+        if PROFILER:
+            self.profiler.show()
+
+    def create_display(self):
+        if VSYNC and not self.headless:
+            # Vsync only works with the SCALED (or OPENGL) flag and not every system supports it, if it fails the normal window is used with the FRAME_CAP
+            try:
+                return pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SCALED, vsync = 1)
+            except pygame.error:
+                pass
+        return pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+
     def load_images(self):
-        self.bullet_surface = pygame.image.load(join('.', 'images', 'gun', 'bullet.png')).convert_alpha()
+        # Decodes every image in the images folder at the same time, after this every image below (and the player and gun images) comes straight out of the cache
+        preload_folder(join('.', 'images'))
+        self.bullet_surface = load_image(join('.', 'images', 'gun', 'bullet.png'))
+        load_masks([self.bullet_surface])
 
         # This sets up a list of the folders associated with the enemies, it grabs the first list printed out since there are no files to grab
         folders = list(walk(join('.', 'images', 'enemies')))[0][1]
         self.enemy_frames = {}
         for folder in folders:
-            # Loop searches through the folder path using walk and join: current -> images -> enemies -> then checks for the folder which holds each enemies individual frames
-            for folder_path, _, file_names in walk(join('.', 'images', 'enemies', folder)):
-                # Sets the dictionary with the folder key to an empty list
-                self.enemy_frames[folder] = []
-                # This searches through the folders for the specific file names, splits them on the '.' and then converts the string that is returned into an integer to be used in the loop
-                for file_name in sorted(file_names, key = lambda name: int(name.split('.')[0])):
-                    # Sets the full path to the joint value of the folder path and the file name
-                    full_path = join(folder_path, file_name)
-                    # Creates a surface which has the image contained in the previous variable and converts it to an alpha to remove the spare pixels
-                    surf = pygame.image.load(full_path).convert_alpha()
-                    # Adds the new image to the values in the frames dictionary based upon the folder  
-                    self.enemy_frames[folder].append(surf)
+            # Loads the frames of each enemy from its folder: current -> images -> enemies -> folder, in the order of the numbers in the file names
+            self.enemy_frames[folder] = load_folder(join('.', 'images', 'enemies', folder))
+            # Makes the collision mask and the white hit flash for every frame of the enemy once
+            load_masks(self.enemy_frames[folder])
+        # The types of enemy in a fixed order, the spawn director picks one by its index
+        self.enemy_types = list(self.enemy_frames.values())
                     
     def input(self):
-        if pygame.mouse.get_pressed()[0] and self.can_shoot:
+        if self.controls.get_mouse_pressed()[0] and self.can_shoot:
             # Creates the starting postion for the bullet based off of the guns direction, plus the direction that the player is facing with an arbitrary number as padding
             pos = self.gun.rect.center + self.gun.player_direction * 50
-            Bullet(self.bullet_surface, pos, self.gun.player_direction, (self.all_sprites, self.bullet_sprites))
+            self.bullet_pool.acquire(self.bullet_surface, pos, self.gun.player_direction, (self.all_sprites, self.bullet_sprites))
             self.can_shoot = False
-            self.shoot_time = pygame.time.get_ticks()
-            self.shoot_sound.play()
-            self.shoot_sound.set_volume(0.02)
+            self.shoot_time = self.game_time
+            self.sounds.play('shoot', self.game_time)
 
     def gun_timer(self):
         if not self.can_shoot:
-            current_time = pygame.time.get_ticks()
+            current_time = self.game_time
             if current_time - self.shoot_time >= self.gun_cooldown:
                 self.can_shoot = True
+
+    def enemy_timer(self):
+        # The director gives back the enemies that should spawn on this step, it keeps the number of enemies inside of the ENEMY_BUDGET
+        spawns = list(self.spawn_director.update(self.game_time, self.player.rect.center, len(self.enemy_sprites)))
+        for pos, enemy_type in spawns:
+            self.spawn_enemy(pos, enemy_type)
+        self.spawn_director.despawn(self.enemy_sprites, self.game_time, self.player.rect.center)
+        return spawns
+
+    def spawn_enemy(self, pos = None, enemy_type = None):
+        # Without a position the director picks one (the benchmark uses this to add enemies outside of the budget)
+        if pos is None:
+            pos, enemy_type = self.spawn_director.choose(self.player.rect.center)
+        self.enemy_pool.acquire(pos, self.enemy_types[enemy_type], (self.all_sprites, self.enemy_sprites), self.player, self.collision_sprites, self.enemy_swarm, self.flow_field)
                 
     def setup(self):
-        map = load_pygame(join('.', 'data', 'maps', 'world.tmx'))
+        # The layers come from a saved copy of the map that is only read again from the TMX file when something in the data folder changes
+        map = load_map(join('.', 'data', 'maps', 'world.tmx'), join('.', 'data', 'cache', 'world.pickle'))
             
         # Creates the collision object for the player to interact with. Didn't have a surface so had to create one with pygame by using the width and height of the collision object
-        for obj in map.get_layer_by_name('Collisions'):
-            CollisionSprite((obj.x, obj.y), pygame.Surface((obj.width, obj.height)), self.collision_sprites)
+        for x, y, width, height in map['Collisions']:
+            CollisionSprite((x, y), pygame.Surface((width, height)), self.collision_sprites)
 
-        for x, y, image in map.get_layer_by_name('Ground').tiles():
-            Sprite((x * TILE_SIZE, y * TILE_SIZE), image, self.all_sprites)
+        # The ground tiles are drawn onto chunks once instead of each tile being its own sprite in the group
+        self.all_sprites.build_ground(map['Ground'])
+        # The size of the map in tiles, based on the furthest ground tile
+        map_size = (max(x for x, _, _ in map['Ground']) + 1, max(y for _, y, _ in map['Ground']) + 1)
             
-        for obj in map.get_layer_by_name('Objects'):
-            CollisionSprite((obj.x, obj.y), obj.image, (self.all_sprites, self.collision_sprites))
+        for x, y, image in map['Objects']:
+            CollisionSprite((x, y), image, (self.all_sprites, self.collision_sprites))
+
+        # Builds the grid used by the player and the enemies to only check the collision sprites that are close to them
+        self.collision_sprites.build_grid()
 
-        for obj in map.get_layer_by_name('Entities'):
-            if obj.name == 'Player':
+        for name, x, y in map['Entities']:
+            if name == 'Player':
                 # Putting the collision sprites at the end of Player makes it an arguement and allows the player to access the group, it isn't in the Collision Sprites group
-                self.player = Player((obj.x,obj.y), self.all_sprites, self.collision_sprites)
-                self.gun = Gun(self.player, self.all_sprites)
+                self.player = Player((x,y), self.all_sprites, self.collision_sprites, self.controls)
+                self.gun = Gun(self.player, self.all_sprites, self.controls)
             else:
                 # Setting up the spawn locations for the enemy based on the tmx map that was provided by adding the x and y for the obj to the spawn positions
-                self.spawn_positions.append((obj.x, obj.y))
+                self.spawn_positions.append((x, y))
+
+        # The flow field works in the background normally, the headless mode (and a game being recorded) works it out straight away so that every run is the same
+        self.flow_field = FlowField(self.collision_sprites, map_size, threaded = not self.headless and self.recorder is None) if ENEMY_FLOW_FIELD else None
+
+        # The swarm needs the finished collision grid and the player, so it is set up after the map has been loaded
+        self.enemy_swarm = EnemySwarm(self.player, self.collision_sprites, self.flow_field) if ENEMY_SWARM else None
+        self.spawn_director = SpawnDirector(self.spawn_positions, len(self.enemy_types), self.random)
 
     def import_assets(self):
         self.player_surf = [pygame.image.load(join('.', 'images', 'player', 'down', f'{i}.png')).convert_alpha() for i in range(4)]
@@ -111,48 +172,98 @@ class Game():
         if self.bullet_sprites:
             for bullet in self.bullet_sprites:
                 # If a bullet collides with an enemy, it will remove the enemy from the active enemy list
-                collision_sprites = pygame.sprite.spritecollide(bullet, self.enemy_sprites, False, pygame.sprite.collide_mask)
+                collision_sprites = self.enemy_sprites.collide(bullet, pygame.sprite.collide_mask)
                 if collision_sprites:
-                    self.hit_sound.play()
-                    self.hit_sound.set_volume(0.1)
+                    self.sounds.play('impact', self.game_time)
                     for sprite in collision_sprites:
                         sprite.destroy()
                     bullet.kill()
 
     def player_collision(self):
-        if pygame.sprite.spritecollide(self.player, self.enemy_sprites, False, pygame.sprite.collide_mask):
+        if self.enemy_sprites.collide(self.player, pygame.sprite.collide_mask):
             self.running = False
 
-    def run(self):
-        while self.running:
-            dt = self.clock.tick() / 1000
-            
-            # Event loop
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                if event.type == self.enemy_event:
-                    # Choice cannot grab values directly, it has to be taken from a list
-                    Enemy(choice(self.spawn_positions), choice(list(self.enemy_frames.values())), (self.all_sprites, self.enemy_sprites), self.player, self.collision_sprites)
-
-            # Update
-            pygame.mouse.set_visible(False)
-            self.gun_timer()
-            self.input()
-            self.all_sprites.update(dt)
+    def events(self):
+        # Event loop
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            if event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                self.profiler.toggle()
+
+    def update(self, dt):
+        self.game_time += dt * 1000
+        self.controls.next_frame()
+        pygame.mouse.set_visible(False)
+        self.gun_timer()
+        spawns = self.enemy_timer()
+        self.input()
+        # The replay stores the spawns by their index so that they take up less space
+        if self.recorder is not None:
+            self.recorder.record(dt, self.controls, [(self.spawn_positions.index(pos), enemy_type) for pos, enemy_type in spawns])
+        # Points the flow field at the player, it only does any work when the player has moved into a new cell
+        if self.flow_field is not None:
+            self.flow_field.update(self.player.rect.center)
+        self.all_sprites.update(dt)
+        # The swarm moves after everything else, the same as the enemies did when they were updated after the player
+        if self.enemy_swarm is not None:
+            self.enemy_swarm.update(dt)
+
+    def draw(self, alpha = 1):
+        # alpha is how far between the last simulation step and the next one this frame is, the moving sprites (and the camera) are drawn that far along
+        self.display_surface.fill('black')
+        # This is causing the display surface to follow the player around, like a camera
+        camera_target = self.all_sprites.position(self.player, alpha) + pygame.Vector2(self.player.rect.size) / 2
+        self.all_sprites.draw(camera_target, alpha)
+        if self.profiler.visible:
+            self.profiler.draw(self.display_surface)
+
+    def present(self):
+        # Shows the finished frame, this is its own method so that the profiler can time it
+        pygame.display.update()
+
+    def simulate(self):
+        # Runs as many fixed steps as fit in the time that has built up, every step is the same size so the game plays the same at any frame rate
+        steps = 0
+        # The small extra amount stops float rounding from skipping a step that should have run
+        while self.accumulator + 1e-9 >= self.step and steps < MAX_SUBSTEPS:
+            self.all_sprites.save_positions()
+            self.update(self.step)
             self.bullet_collision()
             self.player_collision()
+            self.accumulator -= self.step
+            steps += 1
+        # If the game still can't keep up after MAX_SUBSTEPS it slows down instead of trying to catch up forever
+        if self.accumulator >= self.step:
+            self.accumulator = 0
+
+    def run(self, frames = None):
+        # frames stops the game after that many frames, used to run the headless mode for a set amount of time
+        frame = 0
+        try:
+            while self.running and (frames is None or frame < frames):
+                # The frame cap makes tick wait, so the game doesn't use a whole cpu core drawing frames nobody can see. With vsync the display does the waiting
+                self.accumulator += self.clock.tick(0 if VSYNC else FRAME_CAP) / 1000
+                self.events()
 
-            # Drawing
-            self.display_surface.fill('black')
-            # This is causing the display surface to follow the player around, like a camera
-            self.all_sprites.draw(self.player.rect.center)
-            pygame.display.update()
+                # Update
+                self.simulate()
 
-            # self.clock.tick(60)
-        pygame.quit()
+                # Drawing
+                # Float rounding can leave the accumulator a tiny bit below zero, so alpha is kept between 0 and 1
+                self.draw(min(max(self.accumulator / self.step, 0), 1))
+                self.present()
+                if self.profiler.enabled:
+                    self.profiler.end_frame()
+                frame += 1
+        finally:
+            # The replay and the profiler's files are still written if the game stops with an error
+            if self.recorder is not None:
+                self.recorder.close()
+            self.profiler.close()
+            pygame.quit()
 
 # Checks if the file is the current main file, if so it runs the game
 if __name__ == '__main__':
-    game = Game()
+    game = Game(record = REPLAY_RECORD)
     game.run()
\ No newline at end of file
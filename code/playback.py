@@ -0,0 +1,77 @@
+# Plays back recorded games (see REPLAY_RECORD in settings.py) headless and as fast as the cpu allows, several replays at once on a pool of processes
+# Run from the project folder with: python code/playback.py replays/*.replay [--render] [--workers 4] [--json results.json]
+import sys
+from os.path import dirname
+# Lets the game's modules import each other the same way they do when main.py is run
+sys.path.insert(0, dirname(__file__))
+
+import argparse, json
+from settings import *
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from time import perf_counter
+from main import Game
+from replay import ReplayReader, ReplayControls, ReplayDirector
+from benchmark import percentiles
+
+def play(path, render = False):
+    # Runs every recorded step with the recorded controls, dt and spawns, drawing is skipped unless render is set
+    controls = ReplayControls()
+    game = Game(headless = True, controls = controls)
+    game.spawn_director = ReplayDirector(controls, game.spawn_positions, len(game.enemy_types), game.random)
+
+    step_times = []
+    game_time = 0
+    most_enemies = 0
+    start = perf_counter()
+    for step in ReplayReader(path):
+        step_start = perf_counter()
+        controls.step = step
+        # The same order as Game.simulate
+        game.all_sprites.save_positions()
+        game.update(step[0])
+        game.bullet_collision()
+        game.player_collision()
+        if render:
+            game.draw()
+            game.present()
+        step_times.append(perf_counter() - step_start)
+        game_time += step[0]
+        most_enemies = max(most_enemies, len(game.enemy_sprites))
+    wall_time = perf_counter() - start
+
+    result = {
+        'replay': path,
+        'steps': len(step_times),
+        'game_seconds': game_time,
+        'wall_seconds': wall_time,
+        # How many times faster than real time the replay played back
+        'speed': game_time / wall_time if wall_time else 0,
+        'step': percentiles(step_times) if step_times else None,
+        'most_enemies': most_enemies,
+        'enemies_at_end': len(game.enemy_sprites),
+        'player_caught': not game.running,
+    }
+    pygame.quit()
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Headless replay playback for Gun Survivor')
+    parser.add_argument('replays', nargs = '+')
+    parser.add_argument('--render', action = 'store_true', help = 'draw every step as well (still without a window)')
+    parser.add_argument('--workers', type = int, help = 'how many replays play at once, the default is one per cpu')
+    parser.add_argument('--json', help = 'also write the results to this file')
+    args = parser.parse_args()
+
+    # Every replay plays in its own process with its own pygame, so they don't share anything
+    with ProcessPoolExecutor(args.workers) as executor:
+        results = list(executor.map(play, args.replays, repeat(args.render)))
+
+    for result in results:
+        print(f'{result["replay"]}: {result["steps"]} steps, {result["game_seconds"]:.1f} s of game in {result["wall_seconds"]:.1f} s ({result["speed"]:.1f}x real time)')
+        if result['step']:
+            print(f'    step p50 {result["step"]["p50"]:7.3f} ms   p95 {result["step"]["p95"]:7.3f} ms   p99 {result["step"]["p99"]:7.3f} ms   most enemies {result["most_enemies"]}')
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent = 4)
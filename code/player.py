@@ -1,11 +1,15 @@
 from settings import *
+from assets import masks, load_masks, load_folder
 
 class Player(pygame.sprite.Sprite):
-    def __init__(self, pos, groups, collision_sprites):
+    def __init__(self, pos, groups, collision_sprites, controls):
         super().__init__(groups)
+        # Where the keyboard input comes from, the real keyboard or a script in the headless mode
+        self.controls = controls
         self.load_images()
         self.state, self.frame_index = 'down', 0
-        self.image = pygame.image.load(join('.', 'images', 'player', 'down', '0.png')).convert_alpha()
+        self.image = self.frames['down'][0]
+        self.mask = masks[self.image]
         self.rect = self.image.get_frect(center = pos)
         self.hitbox_rect = self.rect.inflate(-60, -100)
 
@@ -23,21 +27,15 @@ class Player(pygame.sprite.Sprite):
         }
 
         for state in self.frames.keys():
-            # Loop searches through the folder path using walk and join: current -> images -> player -> then checks for the state, which is equal to the keys of the frames dictionary
+            # Loads the frames from the folder: current -> images -> player -> state, which is equal to the keys of the frames dictionary
             # The keys in the diction HAVE to have the same names as the sub folders, THIS IS IMPORTANT
-            for folder_path, sub_folders, file_names in walk(join('images', 'player', state)):
-                if file_names:
-                    # Loop sorts through the folders and checks for the file name, if there is a named file in the folder, it converts the string to an int so it can be sorted, then you'd stop reading the file after the '.'.
-                    for file_name in sorted(file_names, key=lambda name: int(name.split('.')[0])):
-                        # Sets full path to be equal to the joining of the folder path and the file name, split on the '.'
-                        full_path = join(folder_path, file_name)
-                        # Creates a surface and loads an image onto it, which is the variable and convered to alpha to remove the excess pixels
-                        surf = pygame.image.load(full_path).convert_alpha()
-                        # Adds the surface to the values in the frames dictionary based upon the state, i.e. 'left' = left sub folder
-                        self.frames[state].append(surf)
+            # The images were already decoded by Game.load_images, so this comes straight out of the cache
+            self.frames[state] = load_folder(join('images', 'player', state))
+            # Makes the collision mask for every frame once so that collide_mask doesn't have to
+            load_masks(self.frames[state])
 
     def input(self):
-        keys = pygame.key.get_pressed()
+        keys = self.controls.get_pressed()
         self.direction.x = int(keys[pygame.K_d]) - int(keys[pygame.K_a])
         self.direction.y = int(keys[pygame.K_s]) - int(keys[pygame.K_w])
         self.direction = self.direction.normalize() if self.direction else self.direction
@@ -50,19 +48,19 @@ class Player(pygame.sprite.Sprite):
         self.rect.center = self.hitbox_rect.center
         
     def collision(self, direction):
-        for sprite in self.collision_sprites:
-            if sprite.rect.colliderect(self.hitbox_rect):
-                # This sets up basic collisions for the player and a sprite, checks the horizontal and vertical collisions
-                if direction =='horizontal':
-                    if self.direction.x > 0:
-                        self.hitbox_rect.right = sprite.rect.left
-                    if self.direction.x < 0:
-                        self.hitbox_rect.left = sprite.rect.right
-                if direction == 'vertical':
-                    if self.direction.y > 0:
-                        self.hitbox_rect.bottom = sprite.rect.top
-                    if self.direction.y < 0:
-                        self.hitbox_rect.top = sprite.rect.bottom
+        # Only the collision sprites in the grid cells around the hitbox are checked instead of every sprite on the map
+        for sprite in self.collision_sprites.colliding(self.hitbox_rect):
+            # This sets up basic collisions for the player and a sprite, checks the horizontal and vertical collisions
+            if direction =='horizontal':
+                if self.direction.x > 0:
+                    self.hitbox_rect.right = sprite.rect.left
+                if self.direction.x < 0:
+                    self.hitbox_rect.left = sprite.rect.right
+            if direction == 'vertical':
+                if self.direction.y > 0:
+                    self.hitbox_rect.bottom = sprite.rect.top
+                if self.direction.y < 0:
+                    self.hitbox_rect.top = sprite.rect.bottom
 
     def animate(self, dt):
         # Get the state
@@ -77,6 +75,8 @@ class Player(pygame.sprite.Sprite):
         self.frame_index += 5 * dt
         # Checks the frames dictionary for the state, grabs the integer value for the index then divides it by the length of the dictionary keys(frames -> state) and gives a remainder
         self.image = self.frames[self.state][int(self.frame_index) % len(self.frames[self.state])]
+        # The mask always has to match the image, collide_mask uses it instead of making a new one
+        self.mask = masks[self.image]
 
     def update(self, dt):
         self.animate(dt)
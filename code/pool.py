@@ -0,0 +1,49 @@
+from settings import *
+
+class SpritePool:
+    def __init__(self, sprite_type, capacity):
+        # Keeps sprites that have been killed so that they can be set up again instead of making a brand new sprite every time
+        self.sprite_type = sprite_type
+        self.capacity = capacity
+        self.free_sprites = []
+        self.in_use = 0
+
+        # Counters: hits are sprites that were reused, misses had to be made new and the high water mark is the most sprites in use at once
+        self.hits = 0
+        self.misses = 0
+        self.high_water_mark = 0
+
+    def acquire(self, *args):
+        # Takes the same arguments as the sprite's __init__, a reused sprite gets them through its reset method instead
+        if self.free_sprites:
+            sprite = self.free_sprites.pop()
+            sprite.reset(*args)
+            self.hits += 1
+        else:
+            sprite = self.sprite_type(*args)
+            sprite.pool = self
+            self.misses += 1
+        self.in_use += 1
+        self.high_water_mark = max(self.high_water_mark, self.in_use)
+        return sprite
+
+    def release(self, sprite):
+        # Called by PooledSprite.kill, the sprite has already been removed from all of its groups
+        self.in_use -= 1
+        # Once the pool is full the sprite is just left for python to clean up
+        if len(self.free_sprites) < self.capacity:
+            self.free_sprites.append(sprite)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'high_water_mark': self.high_water_mark, 'in_use': self.in_use, 'free': len(self.free_sprites)}
+
+class PooledSprite(pygame.sprite.Sprite):
+    # Set by SpritePool.acquire, sprites made without a pool work like normal sprites
+    pool = None
+
+    def kill(self):
+        # Sprites can be killed more than once (for example a bullet that hits an enemy on the frame its lifetime runs out), only the first kill gives it back to the pool
+        was_alive = self.alive()
+        super().kill()
+        if was_alive and self.pool is not None:
+            self.pool.release(self)
@@ -0,0 +1,169 @@
+from settings import *
+from assets import images, flash_surfaces
+from collections import deque
+from time import perf_counter
+import cProfile, csv
+
+class Profiler:
+    def __init__(self, game):
+        # Times the parts of every frame and counts the sprites, blits and surfaces, shown as an overlay (PROFILER_KEY turns it on and off)
+        # While it is off nothing in the game is wrapped, so the only cost is one check per frame in Game.run
+        # enabled means the timing is running, visible means the overlay is being drawn
+        self.game = game
+        self.enabled = False
+        self.visible = False
+
+        # Seconds spent in each timed part during the current frame, the same dict is cleared every frame because the wrappers hold on to it
+        self.frame_times = {}
+        # The last PROFILER_HISTORY values of every time (in miliseconds) and counter, for the graphs
+        self.history = {}
+        self.frame_start = None
+        # (object, attribute name) of every method that has been swapped for a timed one, deleting the attribute brings the class's method back
+        self.instrumented = []
+        self.font = None
+        self.background = None
+
+        # One row per frame for the CSV file, only kept when PROFILER_CSV is set
+        # The timing runs for the whole game then, even while the overlay is hidden
+        self.rows = [] if PROFILER_CSV else None
+        # cProfile covers the whole run (not just the frames while the overlay is on) and is written to PROFILER_CPROFILE when the game closes
+        self.cprofile = None
+        if PROFILER_CPROFILE:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        if self.rows is not None:
+            self.enable()
+
+    def toggle(self):
+        if self.visible:
+            self.hide()
+        else:
+            self.show()
+
+    def show(self):
+        if not self.enabled:
+            self.enable()
+        self.visible = True
+
+    def hide(self):
+        self.visible = False
+        # The timing keeps running while the CSV rows are being recorded
+        if self.rows is None:
+            self.disable()
+
+    def enable(self):
+        game = self.game
+        self.instrument(game, 'input', 'input')
+        self.instrument(game, 'bullet_collision', 'bullet_collision')
+        self.instrument(game, 'player_collision', 'player_collision')
+        self.instrument(game, 'present', 'display_update')
+        self.instrument(game.all_sprites, 'draw', 'draw')
+        # The sprites in all_sprites are updated one type at a time so each type gets its own time
+        game.all_sprites.update = self.update_by_type(game.all_sprites)
+        self.instrumented.append((game.all_sprites, 'update'))
+        if game.enemy_swarm is not None:
+            self.instrument(game.enemy_swarm, 'update', 'update.EnemySwarm')
+        self.frame_times.clear()
+        self.frame_start = perf_counter()
+        self.enabled = True
+
+    def disable(self):
+        for owner, attribute in self.instrumented:
+            delattr(owner, attribute)
+        self.instrumented = []
+        self.enabled = False
+
+    def instrument(self, owner, attribute, name):
+        # Swaps the method on this one object for a timed copy, the class itself isn't touched
+        setattr(owner, attribute, self.timed(name, getattr(owner, attribute)))
+        self.instrumented.append((owner, attribute))
+
+    def timed(self, name, function):
+        frame_times = self.frame_times
+        def timed_function(*args, **kwargs):
+            start = perf_counter()
+            result = function(*args, **kwargs)
+            # A part can run more than once a frame (the fixed timestep can run a few steps), so the times add up
+            frame_times[name] = frame_times.get(name, 0) + perf_counter() - start
+            return result
+        return timed_function
+
+    def update_by_type(self, group):
+        frame_times = self.frame_times
+        def update(*args, **kwargs):
+            # Puts the sprites into a list for each type in the order each type first shows up, so the player still updates before the gun
+            sprites_by_type = {}
+            for sprite in group.sprites():
+                sprites_by_type.setdefault(type(sprite).__name__, []).append(sprite)
+            for type_name, sprites in sprites_by_type.items():
+                start = perf_counter()
+                for sprite in sprites:
+                    sprite.update(*args, **kwargs)
+                name = 'update.' + type_name
+                frame_times[name] = frame_times.get(name, 0) + perf_counter() - start
+        return update
+
+    def counters(self):
+        game = self.game
+        return {
+            'all_sprites': len(game.all_sprites),
+            'enemy_sprites': len(game.enemy_sprites),
+            'bullet_sprites': len(game.bullet_sprites),
+            'collision_sprites': len(game.collision_sprites),
+            'blits': game.all_sprites.blit_count,
+            # pygame can't count every Surface that gets made, so this counts the ones the game makes and holds on to: loaded images, hit flashes, gun rotations and ground chunks
+            'surfaces': len(images) + len(flash_surfaces) + len(game.gun.rotations) + len(game.all_sprites.ground_chunks),
+        }
+
+    def end_frame(self):
+        # Called by Game.run after the frame has been shown, moves this frame's numbers into the history
+        now = perf_counter()
+        values = {'frame': (now - self.frame_start) * 1000}
+        self.frame_start = now
+        values.update((name, seconds * 1000) for name, seconds in self.frame_times.items())
+        values.update(self.counters())
+        self.frame_times.clear()
+
+        for name, value in values.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen = PROFILER_HISTORY)
+            self.history[name].append(value)
+        if self.rows is not None:
+            self.rows.append(values)
+
+    def draw(self, surface):
+        # Every line has the name, the latest value and a graph of the last PROFILER_HISTORY values scaled to the biggest one
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        line_height, graph_width = 18, PROFILER_HISTORY
+        # The see through background is only made again when a new line shows up
+        size = (230 + graph_width, line_height * len(self.history) + 8)
+        if self.background is None or self.background.get_size() != size:
+            self.background = pygame.Surface(size, pygame.SRCALPHA)
+            self.background.fill((0, 0, 0, 180))
+        surface.blit(self.background, (0, 0))
+
+        for line, (name, values) in enumerate(self.history.items()):
+            top = 4 + line * line_height
+            latest = values[-1]
+            # The times are shown to two decimal places and lined up on the right, the counters are whole numbers
+            value = self.font.render(f'{latest:.2f}' if isinstance(latest, float) else str(latest), True, 'white')
+            surface.blit(self.font.render(name, True, 'white'), (6, top))
+            surface.blit(value, value.get_rect(topright = (210, top)))
+            if len(values) > 1:
+                peak = max(values) or 1
+                points = [(220 + index, top + line_height - 3 - (value / peak) * (line_height - 4)) for index, value in enumerate(values)]
+                pygame.draw.lines(surface, 'green', False, points)
+
+    def close(self):
+        # Called when the game closes, writes out the cProfile stats and the CSV file if they were asked for in the settings
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(PROFILER_CPROFILE)
+        if self.rows:
+            # Every name that showed up on any frame gets a column, frames that didn't have it leave it empty
+            columns = list(dict.fromkeys(name for row in self.rows for name in row))
+            with open(PROFILER_CSV, 'w', newline = '') as file:
+                writer = csv.DictWriter(file, columns)
+                writer.writeheader()
+                writer.writerows(self.rows)
@@ -0,0 +1,85 @@
+from settings import *
+from director import SpawnDirector
+from controls import Controls
+from collections import defaultdict
+import struct
+
+# A replay file starts with the header and then has one step record for every simulation step, each followed by the enemies that spawned on that step
+# Records are only ever added to the end, so a game that crashes still leaves a file that plays back up to its last whole step
+REPLAY_HEADER = b'GSRP\x01'
+# dt in seconds, mouse x and y, the pressed keys and mouse buttons as bits and how many enemies spawned
+STEP_RECORD = struct.Struct('<dhhBB')
+# The spawn position (its index in Game.spawn_positions) and the enemy type (its index in Game.enemy_types)
+SPAWN_RECORD = struct.Struct('<HB')
+# The keys (and then the mouse buttons) in the order of their bits in the step record
+REPLAY_KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d)
+
+class ReplayRecorder:
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(REPLAY_HEADER)
+
+    def record(self, dt, controls, spawns):
+        # Called once at the end of every simulation step with the controls the step used and the (position index, enemy type) of every spawn
+        keys = controls.get_pressed()
+        flags = 0
+        for bit, key in enumerate(REPLAY_KEYS):
+            if keys[key]:
+                flags |= 1 << bit
+        for bit, pressed in enumerate(controls.get_mouse_pressed()[:3]):
+            if pressed:
+                flags |= 1 << (len(REPLAY_KEYS) + bit)
+        mouse_x, mouse_y = controls.get_pos()
+        self.file.write(STEP_RECORD.pack(dt, int(mouse_x), int(mouse_y), flags, len(spawns)))
+        for spawn in spawns:
+            self.file.write(SPAWN_RECORD.pack(*spawn))
+        # Every step goes to the file straight away, so if the game is killed or crashes only the step being written can be lost
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class ReplayReader:
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        # Gives back (dt, mouse position, pressed keys, mouse buttons, spawns) for every step, a step cut off part way at the end of the file is left out
+        with open(self.path, 'rb') as file:
+            if file.read(len(REPLAY_HEADER)) != REPLAY_HEADER:
+                raise ValueError(f'{self.path} is not a replay file')
+            while True:
+                data = file.read(STEP_RECORD.size)
+                if len(data) < STEP_RECORD.size:
+                    return
+                dt, mouse_x, mouse_y, flags, spawn_count = STEP_RECORD.unpack(data)
+                data = file.read(SPAWN_RECORD.size * spawn_count)
+                if len(data) < SPAWN_RECORD.size * spawn_count:
+                    return
+                keys = {key for bit, key in enumerate(REPLAY_KEYS) if flags & (1 << bit)}
+                buttons = tuple(bool(flags & (1 << (len(REPLAY_KEYS) + bit))) for bit in range(3))
+                yield dt, (mouse_x, mouse_y), keys, buttons, list(SPAWN_RECORD.iter_unpack(data))
+
+class ReplayControls(Controls):
+    # Plays back the recorded keyboard and mouse, the playback sets step before every simulation step
+    def __init__(self):
+        self.step = (0, (WINDOW_WIDTH / 2, WINDOW_HEIGHT), set(), (False, False, False), [])
+
+    def get_pressed(self):
+        return defaultdict(bool, {key: True for key in self.step[2]})
+
+    def get_pos(self):
+        return self.step[1]
+
+    def get_mouse_pressed(self):
+        return self.step[3]
+
+class ReplayDirector(SpawnDirector):
+    # Spawns the recorded enemies instead of picking them with the random, the despawning still works the same way since it only depends on the game
+    def __init__(self, controls, spawn_positions, enemy_type_count, random):
+        super().__init__(spawn_positions, enemy_type_count, random)
+        self.controls = controls
+
+    def update(self, game_time, player_pos, live_enemies):
+        for position, enemy_type in self.controls.step[4]:
+            yield self.spawn_positions[position], enemy_type
@@ -3,4 +3,49 @@ from os.path import join
 from os import walk
 
 WINDOW_WIDTH, WINDOW_HEIGHT = 1280,720 
-TILE_SIZE = 64
\ No newline at end of file
+TILE_SIZE = 64
+CHUNK_SIZE = 16
+# Moves all of the enemies together with numpy (swarm.py) instead of each enemy moving itself
+ENEMY_SWARM = True
+# The most killed bullets and enemies kept around to be reused (pool.py)
+BULLET_POOL_SIZE = 64
+ENEMY_POOL_SIZE = 512
+# How many different angles the gun can be drawn at, each one is rotated once and then cached
+GUN_ROTATION_STEPS = 360
+# The game logic runs SIMULATION_RATE times a second no matter how fast the frames are drawn, at most MAX_SUBSTEPS times per frame when the game falls behind
+SIMULATION_RATE = 60
+MAX_SUBSTEPS = 5
+# The most frames drawn per second (0 for no limit) and whether to wait for the monitor's refresh instead
+FRAME_CAP = 120
+VSYNC = False
+# Enemies follow a shared flow field around the obstacles to the player (flowfield.py) instead of walking straight at them
+ENEMY_FLOW_FIELD = True
+# The most enemies alive at once, the spawn timer skips spawns while the budget is full (director.py)
+ENEMY_BUDGET = 200
+# (game time, time between spawns) in miliseconds, the time between spawns slides from one point to the next and stays at the last one
+SPAWN_RATE_CURVE = ((0, 600), (30000, 300), (120000, 150), (300000, 100))
+# Enemies further than this from the player are removed (checked every DESPAWN_CHECK_INTERVAL miliseconds) and new ones spawn closer in
+ENEMY_DESPAWN_DISTANCE = 2200
+DESPAWN_CHECK_INTERVAL = 500
+# Enemies further than this from the player only move and animate once every ENEMY_LOD_TICKS updates (taking bigger steps) and don't check for collisions
+ENEMY_LOD_DISTANCE = 900
+ENEMY_LOD_TICKS = 4
+# The profiler overlay (profiler.py): whether it starts on, the key that turns it on and off and how many frames the graphs show
+PROFILER = False
+PROFILER_KEY = pygame.K_F3
+PROFILER_HISTORY = 180
+# When set, a cProfile of the whole run and/or the profiler's numbers for every frame (recorded whether the overlay is on or not) are written to these files when the game closes
+PROFILER_CPROFILE = None
+PROFILER_CSV = None
+# Sound effects (sounds.py): name -> (file, volume, voices, miliseconds before it can play again)
+# Each effect gets its own reserved mixer channels (voices), once they are all busy the oldest one is cut off
+SOUND_EFFECTS = {
+    'shoot': (join('audio', 'shoot.wav'), 0.02, 2, 50),
+    'impact': (join('audio', 'impact.ogg'), 0.1, 3, 40),
+}
+AUDIO_CHANNELS = 16
+# The background music is streamed from the file while it plays, the game just runs without music if it isn't there
+MUSIC_PATH = join('audio', 'music.wav')
+MUSIC_VOLUME = 0.04
+# When set, the game started from main.py records every simulation step to this file, play it back with playback.py
+REPLAY_RECORD = None
@@ -0,0 +1,57 @@
+from settings import *
+from os.path import exists
+
+class SoundEffect:
+    def __init__(self, sound, channels, min_interval):
+        self.sound = sound
+        # The mixer channels that only this effect plays on, so a storm of one sound can't take the channels of the others
+        self.channels = channels
+        self.next_channel = 0
+        # The game time the effect last played, plays closer together than min_interval (like every enemy hit by one bullet) become one
+        self.min_interval = min_interval
+        self.last_play = None
+
+class SoundManager:
+    def __init__(self, music = True):
+        self.effects = {}
+        # Without a sound card pygame's mixer doesn't start, the game still runs but stays silent
+        self.enabled = pygame.mixer.get_init() is not None
+        if not self.enabled:
+            return
+
+        # The first channels are reserved for the effects so pygame never hands them out to anything else
+        pygame.mixer.set_num_channels(AUDIO_CHANNELS)
+        pygame.mixer.set_reserved(sum(voices for _, _, voices, _ in SOUND_EFFECTS.values()))
+        channel = 0
+        for name, (path, volume, voices, min_interval) in SOUND_EFFECTS.items():
+            sound = pygame.mixer.Sound(path)
+            # The volume is set once here instead of every time the sound plays
+            sound.set_volume(volume)
+            self.effects[name] = SoundEffect(sound, [pygame.mixer.Channel(channel + voice) for voice in range(voices)], min_interval)
+            channel += voices
+
+        if music:
+            self.play_music()
+
+    def play(self, name, game_time):
+        if not self.enabled:
+            return
+        effect = self.effects[name]
+        if effect.last_play is not None and game_time - effect.last_play < effect.min_interval:
+            return
+        effect.last_play = game_time
+        # The voices take turns, so when they are all busy the one that started the longest time ago is cut off
+        effect.channels[effect.next_channel].play(effect.sound)
+        effect.next_channel = (effect.next_channel + 1) % len(effect.channels)
+
+    def play_music(self):
+        # pygame.mixer.music reads the file a bit at a time while it plays instead of loading all of it into memory like a Sound
+        if not exists(MUSIC_PATH):
+            return
+        try:
+            pygame.mixer.music.load(MUSIC_PATH)
+        except pygame.error:
+            return
+        pygame.mixer.music.set_volume(MUSIC_VOLUME)
+        # A loop of -1 will have it loop indefinitely
+        pygame.mixer.music.play(loops = -1)
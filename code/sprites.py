@@ -1,51 +1,66 @@
 from settings import *
 from math import atan2, degrees
+from assets import masks, flash_surfaces, load_image
+from pool import PooledSprite
 
 # When importing an image from tiled, you always want to do the topleft for the position
-class Sprite(pygame.sprite.Sprite):
-    def __init__(self, pos, surf, groups):
-        super().__init__(groups)
-        self.image = surf
-        self.rect = self.image.get_frect(topleft = pos)
-        self.ground = True
-
 class CollisionSprite(pygame.sprite.Sprite):
+    # Collision sprites never move, AllSprites uses this to only sort them once
+    static = True
+
     def __init__(self, pos, surf, groups):
         super().__init__(groups)
         self.image = surf
         self.rect = self.image.get_frect(topleft = pos)
 
 class Gun(pygame.sprite.Sprite):
-    def __init__(self, player, groups):
+    def __init__(self, player, groups, controls):
         # Player connection
         self.player = player
+        self.controls = controls
         self.distance = 140
         self.player_direction = pygame.Vector2(0,1)
 
         # Sprite setup
         super().__init__(groups)
-        self.gun_surface = pygame.image.load(join('.', 'images', 'gun', 'gun.png')).convert_alpha()
+        self.gun_surface = load_image(join('.', 'images', 'gun', 'gun.png'))
         self.image = self.gun_surface 
+        # Rotated images of the gun, keyed by (rotation step, flipped), and the direction the current image is facing
+        self.rotations = {}
+        self.rotated_direction = None
         # Places the gun directly next to the player and uses the same logic in the update in order to update the position of the gun relative to the player
         self.rect = self.image.get_frect(center = self.player.rect.center + self.player_direction * self.distance)
 
     def get_direction(self):
-        mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
+        mouse_pos = pygame.Vector2(self.controls.get_pos())
         player_pos = pygame.Vector2(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2)
         # Gets the vector for the mouse direction by getting the end point(mouse) and subtracting the start point(player)
         self.player_direction = (mouse_pos - player_pos).normalize()
 
     def rotate_gun(self):
+        # If the mouse hasn't moved the gun is already facing the right way, so there is nothing to do
+        if self.player_direction == self.rotated_direction:
+            return
+        self.rotated_direction = self.player_direction
+
         # Atan2 will take the width and the height of a triangle, and return the angle in radians which is then turned into degrees. Subtracting 90 will normalize the angle
         angle = degrees(atan2(self.player_direction.x, self.player_direction.y)) - 90
-        # Starts the rotation from the original surface
-        if self.player_direction.x > 0:
-            # Rotates the image based on the surface, the angle (expressed with the angle variable) and the scale
-            self.image = pygame.transform.rotozoom(self.gun_surface, angle, 1)
-        else:
-            self.image = pygame.transform.rotozoom(self.gun_surface, abs(angle), 1)
-            # This takes the image from the previous line and flips it on the vertical axis
-            self.image = pygame.transform.flip(self.image, False, True)
+        # When the gun points left the image is rotated by the positive angle and flipped so it isn't upside down
+        flipped = self.player_direction.x <= 0
+        if flipped:
+            angle = abs(angle)
+
+        # The angle is rounded to one of GUN_ROTATION_STEPS steps, every step is only rotated once and then reused from the cache
+        step = 360 / GUN_ROTATION_STEPS
+        rotation = round(angle / step) % GUN_ROTATION_STEPS
+        if (rotation, flipped) not in self.rotations:
+            # Starts the rotation from the original surface, rotates it based on the angle and the scale
+            image = pygame.transform.rotozoom(self.gun_surface, rotation * step, 1)
+            if flipped:
+                # This takes the rotated image and flips it on the vertical axis
+                image = pygame.transform.flip(image, False, True)
+            self.rotations[(rotation, flipped)] = image
+        self.image = self.rotations[(rotation, flipped)]
 
     def update(self, _):
         self.get_direction()
@@ -53,97 +68,161 @@ class Gun(pygame.sprite.Sprite):
         # Sets up the guns location in relation to the player that will constantly update. Bases the gun off of the center of the player, plus their direction multiplied by the distance between them
         self.rect.center = self.player.rect.center + self.player_direction * self.distance
 
-class Bullet(pygame.sprite.Sprite):
+class Bullet(PooledSprite):
     def __init__(self, surf, pos, direction, groups):
-        super().__init__(groups)
-        self.image = surf
-        self.rect = self.image.get_frect(center = pos)
-        self.start_time = pygame.time.get_ticks()
+        super().__init__()
+        self.rect = surf.get_frect(center = pos)
         self.lifetime = 1000
+        self.speed = 1200
+        self.reset(surf, pos, direction, groups)
+
+    def reset(self, surf, pos, direction, groups):
+        # Sets up everything that changes between shots, the bullet pool calls this when it reuses an old bullet
+        self.image = surf
+        self.mask = masks[self.image]
+        self.rect.size = self.image.get_size()
+        self.rect.center = pos
+        # How long the bullet has been flying for in miliseconds
+        self.age = 0
 
         # Movement
         self.direction = direction
-        self.speed = 1200
+        self.add(groups)
 
     def update(self, dt):
         # Basic logic for the movement of the bullet. Increases the center by the diretion multipled by the speed and delta time in order to create movement
         self.rect.center += self.direction * self.speed * dt
-        # Deletes the bullet sprite after the start time becomes equal or greater than the total life time of the bullet in miliseconds
-        if pygame.time.get_ticks() - self.start_time >= self.lifetime:
+        # Deletes the bullet sprite after its age becomes equal or greater than the total life time of the bullet in miliseconds
+        # The age is counted with delta time instead of the real time, so the headless mode with a fixed delta time always plays out the same
+        self.age += dt * 1000
+        if self.age >= self.lifetime:
             self.kill()
 
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, pos, frames, groups, player, collision_sprites):
-        super().__init__(groups)
-        self.player = player
-
-        # Grabbing the images and setting up the animation speed
-        self.frames, self.frame_index = frames, 0
-        self.image = self.frames[self.frame_index]
+class Enemy(PooledSprite):
+    def __init__(self, pos, frames, groups, player, collision_sprites, swarm = None, flow_field = None):
+        super().__init__()
         self.animation_speed = 6
 
-        # Basic enemy rectangle information
-        self.rect = self.image.get_frect(center = pos)
+        # Basic enemy rectangle information, the rects are made once and then moved around by reset
+        self.rect = frames[0].get_frect(center = pos)
         self.hitbox_rect = self.rect.inflate(-20, -40)
-        self.collision_sprites = collision_sprites
         self.direction = pygame.Vector2()
         self.speed = 150
 
         # Timers
-        self.death_time = 0
         self.death_duration = 100
+        self.swarm_slot = None
+        self.reset(pos, frames, groups, player, collision_sprites, swarm, flow_field)
+
+    def reset(self, pos, frames, groups, player, collision_sprites, swarm = None, flow_field = None):
+        # Sets up everything that changes between enemies, the enemy pool calls this when it reuses an old enemy
+        self.player = player
+
+        # Grabbing the images and setting up the animation
+        self.frames, self.frame_index = frames, 0
+        self.image = self.frames[self.frame_index]
+        self.mask = masks[self.image]
+
+        # The frames can be a different size for each type of enemy, so the rects are resized before being moved
+        self.rect.size = self.image.get_size()
+        self.rect.center = pos
+        self.hitbox_rect.size = (self.rect.width - 20, self.rect.height - 40)
+        self.hitbox_rect.center = pos
+        self.collision_sprites = collision_sprites
+        # The flow field points the way around the obstacles to the player, without one the enemy walks straight at the player
+        self.flow_field = flow_field
+        self.dying = False
+        self.death_time = 0
+        # Counts the updates that a far away enemy has skipped, see ENEMY_LOD_TICKS
+        self.skipped_ticks = 0
+
+        # When the enemy is part of a swarm, the swarm moves and animates it together with every other enemy
+        self.swarm = swarm
+        if self.swarm is not None:
+            self.swarm.add(self)
+        self.add(groups)
 
     def animate(self, dt):
         # Basic animation logic
         self.frame_index += self.animation_speed * dt
         # Checks the frames dictionary for the state, grabs the integer value for the index then divides it by the length of the dictionary keys(frames -> state) and gives a remainder
         self.image = self.frames[int(self.frame_index % len(self.frames))]
+        # The mask always has to match the image, collide_mask uses it instead of making a new one
+        self.mask = masks[self.image]
 
-    def move(self, dt):
+    def move(self, dt, collide = True):
         # Set the direction for the enemies
         player_pos = pygame.Vector2(self.player.rect.center)
         enemy_pos = pygame.Vector2(self.rect.center)
         # Gets the vector for the enemy movement based upon the end point(player) minus the starting point(enemy)
         self.direction = (player_pos - enemy_pos).normalize()
+        # Follows the flow field around obstacles instead, unless the enemy is in the player's cell (or there is no way to the player) where the flow is zero
+        if self.flow_field is not None:
+            flow = self.flow_field.direction(self.rect.center)
+            if flow:
+                self.direction = flow
 
         # Update the position
         self.hitbox_rect.x += self.direction.x * self.speed * dt
-        self.collision('horizontal')
+        if collide:
+            self.collision('horizontal')
         self.hitbox_rect.y += self.direction.y * self.speed * dt
-        self.collision('vertical')
+        if collide:
+            self.collision('vertical')
         self.rect.center = self.hitbox_rect.center
 
     def collision(self, direction):
-        for sprite in self.collision_sprites:
-            if sprite.rect.colliderect(self.hitbox_rect):
-                # This sets up basic collisions for the enemy and the player+objects, checks the horizontal and vertical collisions
-                if direction =='horizontal':
-                    if self.direction.x > 0:
-                        self.hitbox_rect.right = sprite.rect.left
-                    if self.direction.x < 0:
-                        self.hitbox_rect.left = sprite.rect.right
-                if direction == 'vertical':
-                    if self.direction.y > 0:
-                        self.hitbox_rect.bottom = sprite.rect.top
-                    if self.direction.y < 0:
-                        self.hitbox_rect.top = sprite.rect.bottom
+        # Only the collision sprites in the grid cells around the hitbox are checked instead of every sprite on the map
+        for sprite in self.collision_sprites.colliding(self.hitbox_rect):
+            # This sets up basic collisions for the enemy and the player+objects, checks the horizontal and vertical collisions
+            if direction =='horizontal':
+                if self.direction.x > 0:
+                    self.hitbox_rect.right = sprite.rect.left
+                if self.direction.x < 0:
+                    self.hitbox_rect.left = sprite.rect.right
+            if direction == 'vertical':
+                if self.direction.y > 0:
+                    self.hitbox_rect.bottom = sprite.rect.top
+                if self.direction.y < 0:
+                    self.hitbox_rect.top = sprite.rect.bottom
 
     def destroy(self):
         # Start up a timer
-        self.death_time = pygame.time.get_ticks()
+        self.dying = True
+        self.death_time = 0
 
-        # Set up a mask to change the image
-        surf = pygame.mask.from_surface(self.frames[0]).to_surface()
-        surf.set_colorkey('black')
-        self.image = surf
+        # Swaps the image for the white flash of the first frame, both were made when the images were loaded
+        self.image = flash_surfaces[self.frames[0]]
+        self.mask = masks[self.frames[0]]
+        if self.swarm is not None:
+            self.swarm.stop(self)
 
-    def death_timer(self):
-        if pygame.time.get_ticks() - self.death_time >= self.death_duration:
+    def death_timer(self, dt):
+        # Counts up the time since the enemy was shot in miliseconds, using delta time the same way the bullets do
+        self.death_time += dt * 1000
+        if self.death_time >= self.death_duration:
             self.kill()
 
+    def kill(self):
+        # Frees up the enemy's slot in the swarm before it is removed from the groups
+        if self.swarm_slot is not None:
+            self.swarm.remove(self)
+        super().kill()
+
     def update(self, dt):
-        if self.death_time == 0:
-            self.move(dt)
-            self.animate(dt)
+        if not self.dying:
+            # Enemies in a swarm are moved and animated by EnemySwarm.update instead
+            if self.swarm is None:
+                if pygame.Vector2(self.player.rect.center).distance_squared_to(self.rect.center) <= ENEMY_LOD_DISTANCE ** 2:
+                    self.skipped_ticks = 0
+                    self.move(dt)
+                    self.animate(dt)
+                else:
+                    # Far away enemies can't be seen, so they only move and animate every ENEMY_LOD_TICKS updates with a bigger step and go through the collision sprites
+                    self.skipped_ticks += 1
+                    if self.skipped_ticks >= ENEMY_LOD_TICKS:
+                        self.move(dt * self.skipped_ticks, collide = False)
+                        self.animate(dt * self.skipped_ticks)
+                        self.skipped_ticks = 0
         else:
-            self.death_timer()
\ No newline at end of file
+            self.death_timer(dt)
\ No newline at end of file
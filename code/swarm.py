@@ -0,0 +1,169 @@
+from settings import *
+from assets import masks
+import numpy as np
+
+class EnemySwarm:
+    def __init__(self, player, collision_sprites, flow_field = None, capacity = 256):
+        self.player = player
+        self.flow_field = flow_field
+        # Counts the updates, far away enemies only move on some of them (see ENEMY_LOD_TICKS)
+        self.ticks = 0
+        # Every enemy in the swarm gets a slot, the slot is the row in each of the arrays below that holds that enemy's information
+        self.enemies = []
+
+        # Hitbox centers and half sizes are stored instead of the rect so the movement math can be done on every enemy at once
+        self.centers = np.zeros((capacity, 2))
+        self.half_sizes = np.zeros((capacity, 2))
+        self.speeds = np.zeros(capacity)
+        # Animation information, frame_counts is how many frames each enemy's animation has
+        self.frame_indexes = np.zeros(capacity)
+        self.animation_speeds = np.zeros(capacity)
+        self.frame_counts = np.ones(capacity, dtype = int)
+        # Enemies that have been shot stop moving and animating while their death timer runs
+        self.active = np.zeros(capacity, dtype = bool)
+
+        self.load_collisions(collision_sprites)
+
+    def load_collisions(self, collision_sprites):
+        # Every collision rectangle as [left, top, right, bottom], in the same order as the collision sprites group
+        self.collision_rects = np.array([[sprite.rect.left, sprite.rect.top, sprite.rect.right, sprite.rect.bottom] for sprite in collision_sprites.ordered_sprites]).reshape(-1, 4)
+
+        # Marks every TILE_SIZE cell that has a collision sprite in it, the enemies that aren't touching a marked cell can skip the collision checks entirely
+        cells = np.array(list(collision_sprites.grid.keys()), dtype = int).reshape(-1, 2)
+        # The cells are shifted by one so that the cells just outside of the map (-1) still fit in the array
+        self.grid_offset = 1 - cells.min(axis = 0) if len(cells) else np.ones(2, dtype = int)
+        size = (cells.max(axis = 0) + self.grid_offset + 2) if len(cells) else np.ones(2, dtype = int)
+        self.occupied_cells = np.zeros(size, dtype = bool)
+        if len(cells):
+            self.occupied_cells[cells[:, 0] + self.grid_offset[0], cells[:, 1] + self.grid_offset[1]] = True
+
+    def __len__(self):
+        return len(self.enemies)
+
+    def grow(self):
+        # Doubles the size of every array when the swarm runs out of slots
+        for name in ('centers', 'half_sizes', 'speeds', 'frame_indexes', 'animation_speeds', 'frame_counts', 'active'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate((array, np.zeros_like(array))))
+
+    def add(self, enemy):
+        if len(self.enemies) == len(self.speeds):
+            self.grow()
+        slot = len(self.enemies)
+        enemy.swarm_slot = slot
+        self.enemies.append(enemy)
+
+        self.centers[slot] = enemy.hitbox_rect.center
+        self.half_sizes[slot] = (enemy.hitbox_rect.width / 2, enemy.hitbox_rect.height / 2)
+        self.speeds[slot] = enemy.speed
+        self.frame_indexes[slot] = enemy.frame_index
+        self.animation_speeds[slot] = enemy.animation_speed
+        self.frame_counts[slot] = len(enemy.frames)
+        self.active[slot] = True
+
+    def stop(self, enemy):
+        # The enemy stays in the swarm (and on the screen) but stops moving and animating
+        self.active[enemy.swarm_slot] = False
+
+    def remove(self, enemy):
+        # Moves the last enemy into the empty slot so that the arrays never have gaps in them
+        slot, last = enemy.swarm_slot, len(self.enemies) - 1
+        moved_enemy = self.enemies[last]
+        for array in (self.centers, self.half_sizes, self.speeds, self.frame_indexes, self.animation_speeds, self.frame_counts, self.active):
+            array[slot] = array[last]
+        self.enemies[slot] = moved_enemy
+        moved_enemy.swarm_slot = slot
+        self.enemies.pop()
+        enemy.swarm_slot = None
+
+    def overlaps(self, centers, half_sizes, candidates):
+        # Checks which collision rectangles each candidate hitbox overlaps, gives back a (candidates x collision rects) table of True/False
+        rects = self.collision_rects
+        left = (centers[candidates, 0] - half_sizes[candidates, 0])[:, None]
+        right = (centers[candidates, 0] + half_sizes[candidates, 0])[:, None]
+        top = (centers[candidates, 1] - half_sizes[candidates, 1])[:, None]
+        bottom = (centers[candidates, 1] + half_sizes[candidates, 1])[:, None]
+        # The same check that pygame's colliderect uses, touching edges don't count as a collision
+        return (left < rects[:, 2]) & (right > rects[:, 0]) & (top < rects[:, 3]) & (bottom > rects[:, 1])
+
+    def near_collisions(self, centers, half_sizes):
+        # Finds the enemies whose hitbox is in a cell that has a collision sprite in it by checking the cell of every corner of the hitbox
+        first = np.floor((centers - half_sizes) / TILE_SIZE).astype(int) + self.grid_offset
+        last = np.floor((centers + half_sizes) / TILE_SIZE).astype(int) + self.grid_offset
+        # Anything outside of the grid can't touch a collision sprite, so it is clipped to the empty border cells
+        first = np.clip(first, 0, np.array(self.occupied_cells.shape) - 1)
+        last = np.clip(last, 0, np.array(self.occupied_cells.shape) - 1)
+        near = np.zeros(len(centers), dtype = bool)
+        # A hitbox is at most a few cells wide, so every cell that it covers is checked one column/row step at a time
+        for column_step in range(int((last[:, 0] - first[:, 0]).max(initial = 0)) + 1):
+            for row_step in range(int((last[:, 1] - first[:, 1]).max(initial = 0)) + 1):
+                columns = np.minimum(first[:, 0] + column_step, last[:, 0])
+                rows = np.minimum(first[:, 1] + row_step, last[:, 1])
+                near |= self.occupied_cells[columns, rows]
+        return np.nonzero(near)[0]
+
+    def collision(self, centers, half_sizes, directions, axis, near):
+        # The same logic as Enemy.collision for every enemy at once: an enemy moving right is pushed back to the left edge of the collision rect it moved into (and the other way around)
+        # Enemy.collision goes through the collision sprites in order and each push can move the hitbox out of (or into) the next sprite
+        # To get the same result, each round pushes every enemy out of the first sprite it overlaps that comes after the one it was last pushed out of
+        # Only the enemies near the player that moved along this axis are checked
+        pending = self.near_collisions(centers, half_sizes)
+        pending = pending[(directions[pending, axis] != 0) & near[pending]]
+        last_pushed = np.full(len(pending), -1)
+        sprite_order = np.arange(len(self.collision_rects))
+        while len(pending):
+            hits = self.overlaps(centers, half_sizes, pending) & (sprite_order > last_pushed[:, None])
+            still_hitting = hits.any(axis = 1)
+            pending, hits = pending[still_hitting], hits[still_hitting]
+            # argmax gives back the first True in each row, which is the next sprite in order that the enemy overlaps
+            last_pushed = hits.argmax(axis = 1)
+
+            forward = directions[pending, axis] > 0
+            backward = ~forward
+            centers[pending[forward], axis] = self.collision_rects[last_pushed[forward], axis] - half_sizes[pending[forward], axis]
+            centers[pending[backward], axis] = self.collision_rects[last_pushed[backward], axis + 2] + half_sizes[pending[backward], axis]
+
+    def update(self, dt):
+        count = len(self.enemies)
+        if not count:
+            return
+        centers, half_sizes = self.centers[:count], self.half_sizes[:count]
+        active = self.active[:count]
+
+        # Gets the direction for every enemy based on the end point(player) minus the starting point(enemy), enemies sitting right on the player don't move
+        directions = np.array(self.player.rect.center) - centers
+        lengths = np.hypot(directions[:, 0], directions[:, 1])
+
+        # Far away enemies can't be seen, so they only move and animate on one of every ENEMY_LOD_TICKS updates with a bigger step and go through the collision sprites
+        # The slot number spreads them out so that a different quarter (with the default of 4) of them moves on each update
+        self.ticks += 1
+        near = lengths <= ENEMY_LOD_DISTANCE
+        moving = active & (near | ((np.arange(count) + self.ticks) % ENEMY_LOD_TICKS == 0))
+        step_times = np.where(near, dt, dt * ENEMY_LOD_TICKS)
+        directions = np.divide(directions, lengths[:, None], out = np.zeros_like(directions), where = lengths[:, None] > 0)
+        # Enemies follow the flow field around the obstacles, the ones in the player's cell (where the flow is zero) keep walking straight at the player
+        if self.flow_field is not None:
+            flow = self.flow_field.sample(centers)
+            following = flow.any(axis = 1)
+            directions[following] = flow[following]
+        directions[~moving] = 0
+        steps = directions * (self.speeds[:count] * step_times)[:, None]
+
+        # Update the position one axis at a time, the same as Enemy.move
+        centers[:, 0] += steps[:, 0]
+        self.collision(centers, half_sizes, directions, 0, near)
+        centers[:, 1] += steps[:, 1]
+        self.collision(centers, half_sizes, directions, 1, near)
+
+        # Basic animation logic for every enemy that moved
+        self.frame_indexes[:count] += np.where(moving, self.animation_speeds[:count] * step_times, 0)
+        frames = (self.frame_indexes[:count] % self.frame_counts[:count]).astype(int)
+
+        # The enemy sprites only need their rects, image and mask updated so that they can be drawn and collided with, the ones that didn't move are left alone
+        slots = np.nonzero(moving)[0]
+        for slot, center, frame in zip(slots.tolist(), centers[slots].tolist(), frames[slots].tolist()):
+            enemy = self.enemies[slot]
+            enemy.hitbox_rect.center = center
+            enemy.rect.center = center
+            enemy.image = enemy.frames[frame]
+            enemy.mask = masks[enemy.image]